@@ -3,11 +3,12 @@ from __future__ import annotations
 
 import asyncio
 import logging
+from dataclasses import dataclass, field
 from typing import Any
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers import device_registry as dr
 
 from .const import (
@@ -15,9 +16,11 @@ from .const import (
     CONF_DEVICE_SERIAL,
     CONF_DEVICE_TYPE,
     CONF_MANUAL_METERS,
-    DEVICE_TYPE_GAS,
+    DEVICE_MODELS,
+    DEVICE_TYPE_WATER,
     DOMAIN,
 )
+from .coordinator import ElehantDataUpdateCoordinator
 from .scanner import ElehantHistoryScanner
 
 _LOGGER = logging.getLogger(__name__)
@@ -25,17 +28,46 @@ _LOGGER = logging.getLogger(__name__)
 PLATFORMS = [Platform.SENSOR]
 
 
-async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+@dataclass
+class ElehantRuntimeData:
+    """Runtime data for an Elehant config entry."""
+
+    scanner: ElehantHistoryScanner
+    meters: dict[int, dict[str, Any]]
+    coordinators: dict[int, ElehantDataUpdateCoordinator] = field(default_factory=dict)
+
+
+ElehantConfigEntry = ConfigEntry[ElehantRuntimeData]
+
+
+def get_device_model(device_type: str) -> str:
+    """Return the device model name for a meter type."""
+    # Неизвестный тип, как и раньше, считаем счетчиком воды
+    return DEVICE_MODELS.get(device_type, DEVICE_MODELS[DEVICE_TYPE_WATER])
+
+
+async def async_setup_entry(hass: HomeAssistant, entry: ElehantConfigEntry) -> bool:
     """Set up Elehant Meter from a config entry."""
-    hass.data.setdefault(DOMAIN, {})
+    domain_data = hass.data.setdefault(DOMAIN, {})
     
     # Создаем глобальный сканер при первом запуске
-    if "scanner" not in hass.data[DOMAIN]:
-        scanner = ElehantHistoryScanner(hass)
-        hass.data[DOMAIN]["scanner"] = scanner
-        await scanner.start()
-        entry.async_on_unload(scanner.stop)
+    if (scanner := domain_data.get("scanner")) is None:
+        scanner = domain_data["scanner"] = ElehantHistoryScanner(hass)
+        scanner.async_start()
         _LOGGER.info("Global Elehant history scanner created")
+    domain_data["_entry_count"] = domain_data.get("_entry_count", 0) + 1
+    
+    @callback
+    def _release_scanner() -> None:
+        """Stop the global scanner together with the last active entry."""
+        domain_data["_entry_count"] -= 1
+        if domain_data["_entry_count"] <= 0:
+            domain_data.pop("_entry_count")
+            domain_data.pop("scanner").async_stop()
+            _LOGGER.info("Global Elehant history scanner removed")
+    
+    # HA вызывает on_unload и при неудачной настройке entry, так что счетчик не "утечет"
+    entry.async_on_unload(_release_scanner)
     
     # Регистрируем устройства из конфига
     meters = entry.data.get(CONF_MANUAL_METERS, [])
@@ -43,21 +75,44 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         meters = [meters]
     
     device_registry = dr.async_get(hass)
+    # Снимок уже зарегистрированных устройств, чтобы не перезаписывать реестр без изменений
+    existing_devices = {
+        identifier: device
+        for device in dr.async_entries_for_config_entry(device_registry, entry.entry_id)
+        for domain, identifier in device.identifiers
+        if domain == DOMAIN
+    }
     for meter_config in meters:
         serial = meter_config[CONF_DEVICE_SERIAL]
         device_type = meter_config[CONF_DEVICE_TYPE]
         device_name = meter_config[CONF_DEVICE_NAME]
+        model = get_device_model(device_type)
+        
+        device = existing_devices.get(str(serial))
+        if device is not None and device.name == device_name and device.model == model:
+            continue
         
         device_registry.async_get_or_create(
             config_entry_id=entry.entry_id,
             identifiers={(DOMAIN, str(serial))},
             name=device_name,
             manufacturer="Elehant",
-            model="Gas Meter" if device_type == DEVICE_TYPE_GAS else "Water Meter",
+            model=model,
             sw_version="1.0",
         )
-        hass.data[DOMAIN][f"meter_{serial}"] = meter_config
-        _LOGGER.debug(f"Registered meter {serial}")
+        _LOGGER.debug("Registered meter %s with name %s", serial, device_name)
+    
+    entry.runtime_data = ElehantRuntimeData(
+        scanner=scanner,
+        meters={m[CONF_DEVICE_SERIAL]: m for m in meters},
+        coordinators={
+            m[CONF_DEVICE_SERIAL]: ElehantDataUpdateCoordinator(hass, m[CONF_DEVICE_SERIAL])
+            for m in meters
+        },
+    )
+    entry.async_on_unload(scanner.async_add_meters(entry.runtime_data.meters))
+    for serial, coordinator in entry.runtime_data.coordinators.items():
+        entry.async_on_unload(scanner.async_add_listener(serial, coordinator.update_data))
     
     # Запускаем сенсоры
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
@@ -65,20 +120,11 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     return True
 
 
-async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+async def async_unload_entry(hass: HomeAssistant, entry: ElehantConfigEntry) -> bool:
     """Unload a config entry."""
-    unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
-    
-    if unload_ok:
-        # Удаляем данные конкретного счетчика
-        for key in list(hass.data[DOMAIN].keys()):
-            if key.startswith("meter_") or key.startswith("coordinator_"):
-                hass.data[DOMAIN].pop(key, None)
-        
-        # Сканер НЕ останавливаем, если есть другие активные entry
-        # Он остановится, когда удалится последняя entry (через callback в async_setup_entry)
-    
-    return unload_ok
+    # Данные счетчиков живут в entry.runtime_data и удаляются вместе с entry,
+    # сканер освобождается через entry.async_on_unload
+    return await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
 
 
 async def async_migrate_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> bool:
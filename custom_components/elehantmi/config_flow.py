@@ -2,15 +2,14 @@
 from __future__ import annotations
 
 import asyncio
+import contextlib
 import logging
 import time
-from typing import Any
 
 import voluptuous as vol
 
 from homeassistant import config_entries
 from homeassistant.core import callback
-from homeassistant.data_entry_flow import FlowResult
 from homeassistant.helpers import selector
 
 from .const import (
@@ -21,8 +20,8 @@ from .const import (
     CONF_SCAN_INTERVAL,
     CONF_SELECTED_BT_ADAPTER,
     CONF_UNITS,
+    DEFAULT_DEVICE_NAME,
     DEFAULT_SCAN_INTERVAL,
-    DEFAULT_SCAN_TIMEOUT,
     DEVICE_TYPE_GAS,
     DEVICE_TYPE_WATER,
     DOMAIN,
@@ -32,16 +31,115 @@ from .const import (
 
 _LOGGER = logging.getLogger(__name__)
 
+# Статические селекторы и схемы собираются один раз при импорте
+_DEVICE_TYPE_SELECTOR = selector.SelectSelector(
+    selector.SelectSelectorConfig(
+        options=[
+            {"value": DEVICE_TYPE_GAS, "label": "Gas"},
+            {"value": DEVICE_TYPE_WATER, "label": "Water"},
+        ],
+        mode=selector.SelectSelectorMode.DROPDOWN,
+    )
+)
+
+_UNITS_SELECTOR = selector.SelectSelector(
+    selector.SelectSelectorConfig(
+        options=[
+            {"value": UNIT_CUBIC_METERS, "label": "Cubic meters (m³)"},
+            {"value": UNIT_LITERS, "label": "Liters"},
+        ],
+        mode=selector.SelectSelectorMode.DROPDOWN,
+    )
+)
+
+_SCAN_INTERVAL_SELECTOR = selector.NumberSelector(
+    selector.NumberSelectorConfig(
+        min=1,
+        max=300,
+        unit_of_measurement="seconds",
+        mode=selector.NumberSelectorMode.BOX,
+    )
+)
+
+_MANUAL_ADD_BASE_SCHEMA = {
+    vol.Required(CONF_DEVICE_SERIAL): int,
+    vol.Required(CONF_DEVICE_TYPE): _DEVICE_TYPE_SELECTOR,
+    vol.Required(CONF_UNITS): _UNITS_SELECTOR,
+    vol.Required(CONF_DEVICE_NAME, default=DEFAULT_DEVICE_NAME): str,
+}
+
+
+def _adapter_selector(adapters: list[dict[str, str]]) -> selector.SelectSelector:
+    """Build the Bluetooth adapter selector for the given adapters."""
+    return selector.SelectSelector(
+        selector.SelectSelectorConfig(
+            options=adapters,
+            mode=selector.SelectSelectorMode.DROPDOWN,
+        )
+    )
+
+
+BT_ADAPTERS_CACHE_TTL = 30  # секунд
+BT_ADAPTERS_TIMEOUT = 2  # секунд
+
+_bt_adapters_lock = asyncio.Lock()
+_bt_adapters_cache: tuple[float, list[dict[str, str]]] | None = None
+
+
+async def _async_get_bt_adapters() -> list[dict[str, str]]:
+    """Get list of available Bluetooth adapters, cached for a short time."""
+    global _bt_adapters_cache
+    async with _bt_adapters_lock:
+        if (
+            _bt_adapters_cache is not None
+            and time.monotonic() - _bt_adapters_cache[0] < BT_ADAPTERS_CACHE_TTL
+        ):
+            return _bt_adapters_cache[1]
+        
+        adapters = [{"value": "hci0", "label": "Default (hci0)"}]
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                "hciconfig",
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+        except FileNotFoundError:
+            # hciconfig не установлен
+            _LOGGER.debug("hciconfig not found, using default Bluetooth adapter only")
+        except OSError as err:
+            _LOGGER.warning("Failed to run hciconfig: %s", err)
+        else:
+            try:
+                stdout, _ = await asyncio.wait_for(
+                    proc.communicate(), timeout=BT_ADAPTERS_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                # Процесс мог успеть завершиться сам между таймаутом и kill()
+                with contextlib.suppress(ProcessLookupError):
+                    proc.kill()
+                await proc.wait()
+                _LOGGER.warning(
+                    "hciconfig did not respond within %s seconds", BT_ADAPTERS_TIMEOUT
+                )
+            else:
+                if proc.returncode == 0:
+                    seen = {"hci0"}
+                    for line in stdout.decode(errors="replace").splitlines():
+                        if line.startswith("hci"):
+                            adapter = line.partition(":")[0]
+                            if adapter not in seen:
+                                seen.add(adapter)
+                                adapters.append({"value": adapter, "label": adapter})
+        
+        _bt_adapters_cache = (time.monotonic(), adapters)
+        return adapters
+
 
 class ElehantMeterConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for Elehant Meter."""
 
     VERSION = 1
 
-    def __init__(self):
-        """Initialize the config flow."""
-        pass
-
     async def async_step_user(self, user_input=None):
         """Handle the initial step."""
         return await self.async_step_manual_add()
@@ -72,58 +170,16 @@ class ElehantMeterConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             )
         
         # Форма ручного ввода
-        adapters = await self._get_bt_adapters()
+        adapters = await _async_get_bt_adapters()
         return self.async_show_form(
             step_id="manual_add",
             data_schema=vol.Schema({
-                vol.Required(CONF_DEVICE_SERIAL): int,
-                vol.Required(CONF_DEVICE_TYPE): selector.SelectSelector(
-                    selector.SelectSelectorConfig(
-                        options=[
-                            {"value": DEVICE_TYPE_GAS, "label": "Gas"},
-                            {"value": DEVICE_TYPE_WATER, "label": "Water"},
-                        ],
-                        mode=selector.SelectSelectorMode.DROPDOWN,
-                    )
-                ),
-                vol.Required(CONF_UNITS): selector.SelectSelector(
-                    selector.SelectSelectorConfig(
-                        options=[
-                            {"value": UNIT_CUBIC_METERS, "label": "Cubic meters (m³)"},
-                            {"value": UNIT_LITERS, "label": "Liters"},
-                        ],
-                        mode=selector.SelectSelectorMode.DROPDOWN,
-                    )
-                ),
-                vol.Required(CONF_DEVICE_NAME, default="Elehant Meter"): str,
-                vol.Optional(CONF_SELECTED_BT_ADAPTER, default="hci0"): selector.SelectSelector(
-                    selector.SelectSelectorConfig(
-                        options=adapters,
-                        mode=selector.SelectSelectorMode.DROPDOWN,
-                    )
-                ),
+                **_MANUAL_ADD_BASE_SCHEMA,
+                vol.Optional(CONF_SELECTED_BT_ADAPTER, default="hci0"): _adapter_selector(adapters),
             }),
             errors=errors,
         )
 
-    # ---------- ВСПОМОГАТЕЛЬНОЕ ----------
-    async def _get_bt_adapters(self):
-        """Get list of available Bluetooth adapters."""
-        adapters = [{"value": "hci0", "label": "Default (hci0)"}]
-        try:
-            import subprocess
-            result = subprocess.run(["hciconfig"], capture_output=True, text=True)
-            if result.returncode == 0:
-                lines = result.stdout.split("\n")
-                for line in lines:
-                    if line.startswith("hci"):
-                        adapter = line.split(":")[0]
-                        if adapter not in ["hci0"]:
-                            adapters.append({"value": adapter, "label": adapter})
-        except Exception:
-            pass
-        return adapters
-
     @staticmethod
     @callback
     def async_get_options_flow(config_entry):
@@ -143,46 +199,17 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
         if user_input is not None:
             return self.async_create_entry(title="", data=user_input)
 
-        adapters = await self._get_bt_adapters()
+        adapters = await _async_get_bt_adapters()
         return self.async_show_form(
             step_id="init",
             data_schema=vol.Schema({
                 vol.Optional(
                     CONF_SELECTED_BT_ADAPTER,
                     default=self._config_entry.options.get(CONF_SELECTED_BT_ADAPTER, "hci0"),
-                ): selector.SelectSelector(
-                    selector.SelectSelectorConfig(
-                        options=adapters,
-                        mode=selector.SelectSelectorMode.DROPDOWN,
-                    )
-                ),
+                ): _adapter_selector(adapters),
                 vol.Optional(
                     CONF_SCAN_INTERVAL,
                     default=self._config_entry.options.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL),
-                ): selector.NumberSelector(
-                    selector.NumberSelectorConfig(
-                        min=1,
-                        max=300,
-                        unit_of_measurement="seconds",
-                        mode=selector.NumberSelectorMode.BOX,
-                    )
-                ),
+                ): _SCAN_INTERVAL_SELECTOR,
             }),
         )
-
-    async def _get_bt_adapters(self):
-        """Get list of available Bluetooth adapters."""
-        adapters = [{"value": "hci0", "label": "Default (hci0)"}]
-        try:
-            import subprocess
-            result = subprocess.run(["hciconfig"], capture_output=True, text=True)
-            if result.returncode == 0:
-                lines = result.stdout.split("\n")
-                for line in lines:
-                    if line.startswith("hci"):
-                        adapter = line.split(":")[0]
-                        if adapter not in ["hci0"]:
-                            adapters.append({"value": adapter, "label": adapter})
-        except Exception:
-            pass
-        return adapters
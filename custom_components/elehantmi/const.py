@@ -1,6 +1,8 @@
 """Constants for Elehant Meter Integration."""
 from __future__ import annotations
 
+from datetime import timedelta
+
 from homeassistant.const import (
     UnitOfTemperature,
     UnitOfVolume,
@@ -27,10 +29,26 @@ DEFAULT_SCAN_INTERVAL = 60
 DEFAULT_DEVICE_NAME = "Elehant Meter"
 DEFAULT_SCAN_TIMEOUT = 60
 
+# Minimum interval between data updates pushed for one meter (seconds)
+UPDATE_COALESCE_INTERVAL = 0.25
+
+# Unchanged readings are re-sent to listeners no more often than this (seconds)
+UNCHANGED_UPDATE_INTERVAL = 30
+
+# Seen-devices history retention
+HISTORY_MAX_AGE = timedelta(days=7)
+HISTORY_PURGE_INTERVAL = timedelta(hours=1)
+
 # Device types
 DEVICE_TYPE_GAS = "gas"
 DEVICE_TYPE_WATER = "water"
 
+# Device models
+DEVICE_MODELS = {
+    DEVICE_TYPE_GAS: "Gas Meter",
+    DEVICE_TYPE_WATER: "Water Meter",
+}
+
 # Unit types
 UNIT_CUBIC_METERS = "m³"
 UNIT_LITERS = "L"
@@ -40,9 +58,6 @@ SENSOR_TYPE_METER = "meter"
 SENSOR_TYPE_TEMPERATURE = "temperature"
 SENSOR_TYPE_BATTERY = "battery"
 
-# Signal for data updates
-SIGNAL_NEW_DATA = f"{DOMAIN}_new_data"
-
 # Packet parsing constants
 PACKET_HEADER = b"\x14\xff\xff\xff"
 ELEHANT_MARKER = 0x80
@@ -3,10 +3,9 @@ from __future__ import annotations
 
 import asyncio
 import logging
-from datetime import timedelta
 from typing import Any
 
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 
 from .const import DOMAIN
@@ -23,17 +22,16 @@ class ElehantDataUpdateCoordinator(DataUpdateCoordinator):
             hass,
             _LOGGER,
             name=DOMAIN,
-            update_interval=timedelta(seconds=60),  # Will be updated by scanner
+            update_interval=None,  # Data is pushed by the scanner, no polling
         )
         self.serial = serial
-        self._data = {}
 
     async def _async_update_data(self) -> dict[str, Any]:
         """Fetch data from scanner (passive)."""
         # Data is pushed from scanner via async_set_updated_data
-        return self._data
+        return self.data or {}
 
+    @callback
     def update_data(self, data: dict[str, Any]) -> None:
         """Update data from scanner."""
-        self._data = data
         self.async_set_updated_data(data)
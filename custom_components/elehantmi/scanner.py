@@ -3,20 +3,23 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import struct
 import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
 from typing import Any, Callable
 
 from homeassistant.components import bluetooth
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
 
 from .const import (
-    CONF_DEVICE_SERIAL,
     CONF_DEVICE_TYPE,
     DEVICE_TYPE_GAS,
     DEVICE_TYPE_WATER,
-    DOMAIN,
     ELEHANT_MARKER,
+    HISTORY_MAX_AGE,
+    HISTORY_PURGE_INTERVAL,
     IDX_MARKER,
     IDX_SERIAL_END,
     IDX_SERIAL_START,
@@ -28,109 +31,107 @@ from .const import (
     MAC_PREFIXES,
     MAC_TYPE_IDX,
     SEPARATOR,
-    SIGNAL_NEW_DATA,
+    UNCHANGED_UPDATE_INTERVAL,
+    UPDATE_COALESCE_INTERVAL,
 )
 
 _LOGGER = logging.getLogger(__name__)
 
+# Пакет счетчика от маркера (16 байт, little-endian): маркер, последовательность (uint8),
+# 4 байта пропуска, серийный номер (uint16 + uint8), значение (uint32),
+# байт-разделитель, температура (uint16)
+_METER_STRUCT = struct.Struct("<xB4xHBIxH")
+_MARKER_BYTE = bytes((ELEHANT_MARKER,))
+
+# Сдвиги октетов модели и типа в 48-битном числе MAC-адреса
+_MAC_MODEL_SHIFT = (5 - MAC_MODEL_IDX) * 8
+_MAC_TYPE_SHIFT = (5 - MAC_TYPE_IDX) * 8
+
 def extract_info_from_mac(mac: str) -> dict | None:
     """Extract model, type and serial from MAC address."""
-    if not mac or not any(mac.startswith(p) for p in MAC_PREFIXES):
-        return None
-    
-    parts = mac.split(":")
-    if len(parts) != 6:
+    if not mac or mac[:3] not in MAC_PREFIXES or len(mac) != 17:
         return None
     
     try:
-        # Префикс может быть B0 или B1 - берем байт модели из 2-го октета
-        model_hex = parts[MAC_MODEL_IDX]  # Это всегда второй октет
-        type_hex = parts[MAC_TYPE_IDX]    # Это третий октет
-        serial_hex = parts[3] + parts[4] + parts[5]
-        
-        model = int(model_hex, 16)
-        type_byte = int(type_hex, 16)
-        serial = int(serial_hex, 16)
-        
-        # Возвращаем информацию из MAC, но не определяем тип устройства по модели
-        # Тип устройства будет определен при настройке интеграции
-        return {
-            "serial": serial,
-            "model": model,
-            "type_byte": type_byte,
-            "device_type": None,  # Не определяем тип по MAC
-            "mac": mac,
-        }
-    except (ValueError, IndexError) as e:
-        _LOGGER.debug(f"Error parsing MAC {mac}: {e}")
+        # Весь MAC одним числом (48 бит), поля достаем сдвигами
+        raw = int(mac.replace(":", ""), 16)
+    except ValueError as e:
+        _LOGGER.debug("Error parsing MAC %s: %s", mac, e)
         return None
+    
+    # Префикс может быть B0 или B1 - байт модели во 2-м октете, тип в 3-м
+    model = (raw >> _MAC_MODEL_SHIFT) & 0xFF
+    type_byte = (raw >> _MAC_TYPE_SHIFT) & 0xFF
+    serial = raw & 0xFFFFFF  # последние 3 октета
+    
+    # Возвращаем информацию из MAC, но не определяем тип устройства по модели
+    # Тип устройства будет определен при настройке интеграции
+    return {
+        "serial": serial,
+        "model": model,
+        "type_byte": type_byte,
+        "device_type": None,  # Не определяем тип по MAC
+        "mac": mac,
+    }
 
 def parse_meter_data(manufacturer_data: dict[int, bytes]) -> dict[str, Any] | None:
     """Parse manufacturer data from Elehant meter."""
-    if not manufacturer_data:
-        return None
-    
     # Get the data (usually on manufacturer ID 0xFFFF)
-    data = None
-    for mfr_id, mfr_data in manufacturer_data.items():
-        if mfr_id == 0xFFFF or mfr_id == 65535:
-            data = mfr_data
-            break
-    
-    if not data:
+    data = manufacturer_data.get(0xFFFF)
+    if data is None:
         return None
     
     # Проверяем минимальную длину данных
     if len(data) < 16:  # Минимальная длина для разбора основных полей
-        _LOGGER.debug(f"Неверная длина данных: {len(data)} байт")
+        _LOGGER.debug("Неверная длина данных: %s байт", len(data))
         return None
     
     # Проверяем маркер Elehant (0x80) - может быть на разных позициях
-    marker_pos = -1
-    for i in range(min(4, len(data))):  # Ищем маркер в первых 4 байтах
-        if data[i] == ELEHANT_MARKER:
-            marker_pos = i
-            break
+    marker_pos = data.find(_MARKER_BYTE, 0, 4)  # Ищем маркер в первых 4 байтах
     
     if marker_pos == -1:
-        _LOGGER.debug(f"Маркер Elehant (0x{ELEHANT_MARKER:02X}) не найден")
+        _LOGGER.debug("Маркер Elehant (0x%02X) не найден", ELEHANT_MARKER)
         return None
     
     offset = marker_pos
-    _LOGGER.debug(f"Найден маркер Elehant на позиции {offset}, длина данных: {len(data)}")
+    _LOGGER.debug("Найден маркер Elehant на позиции %s, длина данных: %s", offset, len(data))
     
     # Проверяем, достаточно ли данных для разбора
     if len(data) - offset < 16:  # Нужно минимум 16 байт после маркера
-        _LOGGER.debug(f"Недостаточно данных для разбора: {len(data)-offset} байт после маркера")
+        _LOGGER.debug("Недостаточно данных для разбора: %s байт после маркера", len(data) - offset)
         return None
     
-    try:
-        # Серийный номер (3 байта, little-endian) - на позиции offset+6
-        serial_bytes = data[offset + 6:offset + 9]
-        serial = int.from_bytes(serial_bytes, byteorder="little")
-        
-        # Значение счетчика (4 байта, little-endian) - на позиции offset+9
-        value_bytes = data[offset + 9:offset + 13]
-        value = int.from_bytes(value_bytes, byteorder="little")
-        
-        # Температура (2 байта, little-endian) - на позиции offset+14
-        temp_bytes = data[offset + 14:offset + 16]
-        temp_raw = int.from_bytes(temp_bytes, byteorder="little")
-        temperature = temp_raw / 100.0
-        
-        # Последовательность (1 байт) - на позиции offset+1
-        sequence = data[offset + 1]
-        
-        return {
-            "serial": serial,
-            "value": value,
-            "temperature": temperature,
-            "sequence": sequence,
-            "raw_data": data.hex(),
-        }
-    except Exception as e:
-        _LOGGER.debug(f"Ошибка парсинга: {e}, данные: {data.hex()}")
-        return None
+    # Все поля пакета одним вызовом, относительно маркера:
+    # +1 последовательность, +6..8 серийный номер (3 байта), +9 значение,
+    # +14 температура (little-endian). Длина проверена выше, unpack_from не упадет
+    sequence, serial_lo, serial_hi, value, temp_raw = _METER_STRUCT.unpack_from(data, offset)
+    
+    return {
+        "serial": serial_lo | (serial_hi << 16),
+        "value": value,
+        "temperature": temp_raw / 100.0,
+        "sequence": sequence,
+        "raw_data": data,
+    }
+
+
+@dataclass(slots=True)
+class DeviceRecord:
+    """History record of a seen Elehant device."""
+
+    serial: int
+    model: int
+    type_byte: int
+    device_type: str | None
+    mac: str
+    first_seen: float  # по hass.loop.time()
+    last_seen: float
+    packets: int = 0
+    best_rssi: int = 0
+    last_value: int | None = None
+    last_temperature: float | None = None
+    last_raw: bytes | None = None
+    last_sequence: int | None = None
 
 
 class ElehantHistoryScanner:
@@ -140,155 +141,276 @@ class ElehantHistoryScanner:
         """Initialize the history scanner."""
         self.hass = hass
         self._cancel_callback: Callable | None = None
-        self._scan_task: asyncio.Task | None = None
+        self._cancel_purge: Callable | None = None
+        
+        # История устройств: { mac: DeviceRecord }
+        self.seen_devices: dict[str, DeviceRecord] = {}
+        
+        # Настроенные счетчики: { serial: meter_config }
+        self.configured_meters: dict[int, dict[str, Any]] = {}
+        
+        # Подписчики на данные счетчиков: { serial: [callback, ...] }
+        self._listeners: dict[int, list[Callable[[dict[str, Any]], None]]] = {}
         
-        # История устройств: { mac: { ... } }
-        self.seen_devices: dict[str, dict] = {}
+        # Объединение частых обновлений: последние отправленные и отложенные данные по serial
+        self._last_dispatch: dict[int, float] = {}
+        self._pending_updates: dict[int, dict[str, Any]] = {}
+        self._flush_handles: dict[int, asyncio.TimerHandle] = {}
         
         _LOGGER.info("Elehant History Scanner initialized with HA Bluetooth API")
 
+    @callback
     def _detection_callback(
         self, 
         service_info: bluetooth.BluetoothServiceInfoBleak,
         change: bluetooth.BluetoothChange
     ) -> None:
         """Handle device detection from HA Bluetooth API."""
-    
-        # 🚫 БЛОКИРУЕМ ИЗВЕСТНОГО СПАМЕРА
-        blocked_macs = {
-        "1A:EC:A8:F2:57:22",  # Этот сука
-        # "можно добавить еще mac через запятую"
-        }
-
-        if service_info.address in blocked_macs:
-            return  # Игнорируем нахуй
-        
-        # Выводим всё для отладки
-        _LOGGER.debug(f"HA BLE: {service_info.address} RSSI:{service_info.rssi}")
+        address = service_info.address
         
-        # Проверяем MAC
-        if not any(service_info.address.startswith(p) for p in MAC_PREFIXES):
+        # Проверяем MAC до любой другой работы - большинство объявлений не от Элехант
+        if address[:3] not in MAC_PREFIXES:
             return
         
-        # Кричим, если нашли B0:
-        _LOGGER.debug(f"!!! НАШЕЛ ПОТЕНЦИАЛЬНЫЙ ЭЛЕХАНТ: {service_info.address}")
-        _LOGGER.debug(f"!!! Данные производителя: {service_info.manufacturer_data}")
-        _LOGGER.debug(f"!!! RSSI: {service_info.rssi}")
+        # Читаем атрибуты один раз, дальше работаем с локальными переменными
+        manufacturer_data = service_info.manufacturer_data
+        rssi = service_info.rssi
+        seen_devices = self.seen_devices
         
-        # Извлекаем информацию из MAC
-        mac_info = extract_info_from_mac(service_info.address)
-        if not mac_info:
-            _LOGGER.warning(f"Не удалось извлечь данные из MAC {service_info.address}")
-            return
+        _LOGGER.debug(
+            "Найден потенциальный Элехант: %s mfr=%r rssi=%s",
+            address, manufacturer_data, rssi,
+        )
         
-        # Парсим данные пакета
-        parsed = parse_meter_data(service_info.manufacturer_data)
-        if parsed:
-           _LOGGER.info(f"Получены данные от счетчика {parsed['serial']}: значение={parsed['value']}, температура={parsed['temperature']}°C")
+        # Извлекаем информацию из MAC (для известных устройств она уже есть в истории)
+        record = seen_devices.get(address)
+        if record is None:
+            mac_info = extract_info_from_mac(address)
+            if not mac_info:
+                _LOGGER.debug("Не удалось извлечь данные из MAC %s", address)
+                return
+            serial = mac_info["serial"]
         else:
-            _LOGGER.warning(f"Не удалось распарсить данные от {service_info.address}, raw data: {service_info.manufacturer_data}")
+            serial = record.serial
         
-        now = time.time()
-        mac = service_info.address
+        # Показания разбираем только для настроенных счетчиков,
+        # остальные устройства попадают в историю без данных пакета
+        parsed = None
+        if serial in self.configured_meters:
+            # Парсим данные пакета (данные Элехант всегда идут под manufacturer ID 0xFFFF)
+            parsed = parse_meter_data(manufacturer_data)
+            if parsed:
+                _LOGGER.debug(
+                    "Получены данные от счетчика %s: значение=%s, температура=%s°C",
+                    parsed["serial"], parsed["value"], parsed["temperature"],
+                )
+            else:
+                _LOGGER.debug("Не удалось распарсить данные от %s, raw data: %r", address, manufacturer_data)
+        
+        # Монотонные часы цикла событий: без системного вызова и скачков настенного времени
+        now = self.hass.loop.time()
+        
+        if record is None:
+            # Новое устройство
+            record = seen_devices[address] = DeviceRecord(
+                serial=mac_info["serial"],
+                model=mac_info["model"],
+                type_byte=mac_info["type_byte"],
+                device_type=mac_info["device_type"],
+                mac=address,
+                first_seen=now,
+                last_seen=now,
+                best_rssi=rssi,
+            )
+            _LOGGER.info(
+                "New Elehant device discovered: %s (SN:%s, Model:%s, Type:%s)",
+                address, record.serial, record.model, record.device_type,
+            )
         
         # Обновляем историю
-        self._update_history(mac, mac_info, parsed, service_info, now)
+        self._update_history(record, parsed, rssi, now)
 
-    def _update_history(self, mac: str, mac_info: dict, parsed: dict | None, service_info: bluetooth.BluetoothServiceInfoBleak, timestamp: float):
+    @callback
+    def _update_history(self, record: DeviceRecord, parsed: dict | None, rssi: int, timestamp: float) -> None:
         """Update the device history."""
-        if mac not in self.seen_devices:
-            # Новое устройство
-            self.seen_devices[mac] = {
-                "serial": mac_info["serial"],
-                "model": mac_info["model"],
-                "type_byte": mac_info["type_byte"],
-                "device_type": mac_info["device_type"],
-                "mac": mac,
-                "first_seen": timestamp,
-                "last_seen": timestamp,
-                "packets": 0,
-                "best_rssi": service_info.rssi,
-                "manufacturer_data": {},
-            }
-            _LOGGER.info(f"New Elehant device discovered: {mac} (SN:{mac_info['serial']}, Model:{mac_info['model']}, Type:{mac_info['device_type']})")
-        
-        # Обновляем существующее
-        device_info = self.seen_devices[mac]
-        device_info["last_seen"] = timestamp
-        device_info["packets"] += 1
-        if service_info.rssi > device_info["best_rssi"]:
-            device_info["best_rssi"] = service_info.rssi
+        record.last_seen = timestamp
+        record.packets += 1
+        if rssi > record.best_rssi:
+            record.best_rssi = rssi
         
         # Если есть данные счетчика, сохраняем последние показания
         if parsed:
-            device_info["last_value"] = parsed["value"]
-            device_info["last_temperature"] = parsed["temperature"]
-            device_info["last_raw"] = parsed["raw_data"]
+            serial = record.serial
+            # Счетчик повторяет одно и то же объявление, пока не сменится номер пакета
+            sequence = parsed["sequence"]
+            value = parsed["value"]
+            temperature = parsed["temperature"]
+            duplicate = sequence == record.last_sequence
+            unchanged = value == record.last_value and temperature == record.last_temperature
+            record.last_sequence = sequence
+            record.last_value = value
+            record.last_temperature = temperature
+            record.last_raw = parsed["raw_data"]
             
             # Используем тип устройства из конфигурации, а не из MAC
             # Если устройство уже настроено, используем его тип
-            configured_device_type = None
-            for key, meter_config in self.hass.data.get(DOMAIN, {}).items():
-                if key.startswith("meter_") and meter_config.get(CONF_DEVICE_SERIAL) == mac_info["serial"]:
-                    configured_device_type = meter_config.get(CONF_DEVICE_TYPE)
-                    break
+            if (meter_config := self.configured_meters.get(serial)) is not None:
+                if configured_device_type := meter_config.get(CONF_DEVICE_TYPE):
+                    record.device_type = configured_device_type
             
-            # Если тип устройства известен из настройки, используем его
-            if configured_device_type:
-                device_info["device_type"] = configured_device_type
-            elif device_info["device_type"] is None:
-                # Если тип все еще не определен, используем информацию из MAC как резерв
-                device_info["device_type"] = mac_info["device_type"]
+            # Повторы уже отправленного пакета подписчикам не шлем,
+            # неизменившиеся показания - не чаще раза в UNCHANGED_UPDATE_INTERVAL
+            if (last_dispatch := self._last_dispatch.get(serial)) is not None and (
+                duplicate
+                or (unchanged and timestamp - last_dispatch < UNCHANGED_UPDATE_INTERVAL)
+            ):
+                return
             
             # Если этот счетчик уже настроен, шлем обновление
-            self._notify_meter_update(mac_info["serial"], parsed, service_info.rssi)
+            self._notify_meter_update(serial, parsed, rssi)
 
+    @callback
     def _notify_meter_update(self, serial: int, parsed: dict, rssi: int):
         """Notify a configured meter about new data."""
-        coordinator_key = f"coordinator_{serial}"
-        if coordinator_key in self.hass.data.get(DOMAIN, {}):
-            coordinator = self.hass.data[DOMAIN][coordinator_key]
-            update_data = {
-                "serial": serial,
-                "value": parsed["value"],
-                "temperature": parsed["temperature"],
-                "rssi": rssi,
-            }
-            coordinator.update_data(update_data)
-            async_dispatcher_send(self.hass, SIGNAL_NEW_DATA, update_data)
+        if serial not in self._listeners:
+            return
+        update_data = {
+            "serial": serial,
+            "value": parsed["value"],
+            "temperature": parsed["temperature"],
+            "rssi": rssi,
+        }
+        
+        # Не чаще одного обновления за UPDATE_COALESCE_INTERVAL на счетчик,
+        # промежуточные пакеты заменяются самым свежим
+        if serial in self._pending_updates:
+            # Отправка уже запланирована - просто подменяем данные,
+            # чтобы более старый пакет не ушел после нового
+            self._pending_updates[serial] = update_data
+            return
+        now = self.hass.loop.time()
+        elapsed = now - self._last_dispatch.get(serial, -UPDATE_COALESCE_INTERVAL)
+        if elapsed < UPDATE_COALESCE_INTERVAL:
+            self._pending_updates[serial] = update_data
+            self._flush_handles[serial] = self.hass.loop.call_later(
+                UPDATE_COALESCE_INTERVAL - elapsed, self._flush_pending_update, serial
+            )
+            return
+        self._dispatch_update(serial, update_data, now)
+
+    @callback
+    def _flush_pending_update(self, serial: int) -> None:
+        """Dispatch the newest postponed update of a meter."""
+        self._flush_handles.pop(serial, None)
+        if (update_data := self._pending_updates.pop(serial, None)) is not None:
+            self._dispatch_update(serial, update_data, self.hass.loop.time())
+
+    @callback
+    def _dispatch_update(self, serial: int, update_data: dict[str, Any], now: float) -> None:
+        """Pass update data to the listeners of a meter."""
+        self._last_dispatch[serial] = now
+        for listener in self._listeners.get(serial, ()):
+            listener(update_data)
+
+    @callback
+    def async_add_listener(
+        self, serial: int, update_callback: Callable[[dict[str, Any]], None]
+    ) -> Callable[[], None]:
+        """Listen for data updates of the meter with the given serial."""
+        listeners = self._listeners.setdefault(serial, [])
+        listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            """Remove the update listener."""
+            listeners.remove(update_callback)
+            if not listeners:
+                self._listeners.pop(serial, None)
+                self._last_dispatch.pop(serial, None)
+                self._pending_updates.pop(serial, None)
+                if (handle := self._flush_handles.pop(serial, None)) is not None:
+                    handle.cancel()
+
+        return remove_listener
+
+    @callback
+    def async_add_meters(self, meters: dict[int, dict[str, Any]]) -> Callable[[], None]:
+        """Register configured meters, keyed by serial."""
+        self.configured_meters.update(meters)
+
+        @callback
+        def remove_meters() -> None:
+            """Unregister the meters."""
+            for serial in meters:
+                self.configured_meters.pop(serial, None)
+
+        return remove_meters
 
     def get_recent_devices(self, hours: int = 24) -> list[dict]:
         """Get devices seen in the last N hours."""
-        now = time.time()
+        now = self.hass.loop.time()
         cutoff = now - (hours * 3600)
+        # История хранится по часам цикла событий, наружу отдаем настенное время
+        wall_offset = time.time() - now
+        # Словари собираем только здесь, вне горячего пути
         recent = []
-        for mac, info in self.seen_devices.items():
-            if info["last_seen"] >= cutoff:
-                recent.append({"mac": mac, **info})
+        for record in self.seen_devices.values():
+            if record.last_seen >= cutoff:
+                info = asdict(record)
+                info["first_seen"] += wall_offset
+                info["last_seen"] += wall_offset
+                recent.append(info)
         return recent
 
-    async def start(self):
+    @callback
+    def _async_purge_history(self, now: datetime | None = None) -> None:
+        """Forget devices that have not been seen for HISTORY_MAX_AGE."""
+        cutoff = self.hass.loop.time() - HISTORY_MAX_AGE.total_seconds()
+        stale = [mac for mac, record in self.seen_devices.items() if record.last_seen < cutoff]
+        for mac in stale:
+            del self.seen_devices[mac]
+        if stale:
+            _LOGGER.debug("Purged %s stale devices from history", len(stale))
+
+    @callback
+    def async_start(self) -> None:
         """Start listening for Bluetooth devices via HA API."""
         _LOGGER.info("Starting Elehant history scanner via HA Bluetooth API")
         
         from homeassistant.components.bluetooth import (
             async_register_callback,
+            BluetoothCallbackMatcher,
             BluetoothScanningMode,
         )
         
+        # Счетчики Элехант передают данные под manufacturer ID 0xFFFF,
+        # остальные объявления HA отфильтрует до вызова нашего колбэка
         self._cancel_callback = async_register_callback(
             self.hass,
             self._detection_callback,
-            {},
-            BluetoothScanningMode.ACTIVE,  # ← АКТИВНЫЙ РЕЖИМ!
+            BluetoothCallbackMatcher(manufacturer_id=0xFFFF, connectable=False),
+            # Все данные в самом объявлении, scan response не нужен. Режим только
+            # объявляет потребность интеграции: HA его не применяет и адаптеры не переключает
+            BluetoothScanningMode.PASSIVE,
+        )
+        self._cancel_purge = async_track_time_interval(
+            self.hass, self._async_purge_history, HISTORY_PURGE_INTERVAL
         )
         
         _LOGGER.info("Elehant history scanner started successfully")
 
-    async def stop(self):
+    @callback
+    def async_stop(self) -> None:
         """Stop listening for Bluetooth devices."""
         _LOGGER.info("Stopping Elehant history scanner")
         if self._cancel_callback:
             self._cancel_callback()
             self._cancel_callback = None
+        if self._cancel_purge:
+            self._cancel_purge()
+            self._cancel_purge = None
+        for handle in self._flush_handles.values():
+            handle.cancel()
+        self._flush_handles.clear()
+        self._pending_updates.clear()
         _LOGGER.info("Elehant history scanner stopped")